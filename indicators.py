@@ -0,0 +1,63 @@
+import numpy as np
+
+# Numba is optional, the indicator kernels run as plain Python without it
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return args[0] if args and callable(args[0]) else (lambda func: func)
+
+# RSI with Wilder's smoothing, NaN until a full period of price changes is available
+@njit(cache=True)
+def rsi_wilder(close, period):
+    rsi = np.full(close.size, np.nan)
+    if close.size <= period:
+        return rsi
+    delta = np.diff(close)
+    gains = np.maximum(delta, 0.0)
+    losses = np.maximum(-delta, 0.0)
+    # Seed with the simple average of the first period
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(period):
+        avg_gain += gains[i]
+        avg_loss += losses[i]
+    avg_gain /= period
+    avg_loss /= period
+    for i in range(period, close.size):
+        if i > period:
+            avg_gain = (avg_gain * (period - 1) + gains[i - 1]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i - 1]) / period
+        if avg_gain + avg_loss > 0:
+            rsi[i] = 100.0 * avg_gain / (avg_gain + avg_loss)
+    return rsi
+
+# Exponential moving average, same as ewm(alpha=alpha, adjust=False).mean() for NaN-free input
+@njit(cache=True)
+def ema(x, alpha):
+    y = np.empty(x.size)
+    if x.size == 0:
+        return y
+    y[0] = x[0]
+    for i in range(1, x.size):
+        y[i] = alpha * x[i] + (1.0 - alpha) * y[i - 1]
+    return y
+
+# Strategy returns, each day's return is taken with the previous day's signal
+@njit(cache=True)
+def apply_signal(signal, returns):
+    strategy_returns = np.empty_like(returns)
+    if returns.size == 0:
+        return strategy_returns
+    strategy_returns[0] = np.nan
+    for i in range(1, returns.size):
+        strategy_returns[i] = signal[i - 1] * returns[i]
+    return strategy_returns
+
+# Simple moving average from a cumulative sum, NaN until a full window is available
+# (same as rolling(window).mean() for the NaN-free prices returned by load_data)
+def sma(x, window):
+    cumsum = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    ma = np.full(x.size, np.nan)
+    ma[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return ma
@@ -1,7 +1,14 @@
 import streamlit as st
 import yfinance as yf
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.figure import Figure
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import os
+import tempfile
+# The indicator kernels live in a module, Streamlit reruns this script but imports it only once
+from indicators import rsi_wilder, ema, apply_signal, sma
 
 # Streamlit page configuration
 st.set_page_config(page_title="Trading Strategies", page_icon="📈", layout="wide")
@@ -34,9 +41,15 @@ tickers_index_average = {
     "Dow Jones": "^DJI",
     "CAC 40": "^FCHI"
 }
+tickers_urls = {
+    "S&P 500": "https://datahub.io/core/s-and-p-500-companies/r/0.csv",
+    "NASDAQ-100": "https://datahub.io/core/nasdaq-listings/r/0.csv"
+}
+tickers_files = {
+    "S&P 500": Path(__file__).with_name("constituents") / "sp500.csv",
+    "NASDAQ-100": Path(__file__).with_name("constituents") / "nasdaq100.csv"
+}
 tickers = {
-    "S&P 500": list(pd.read_csv("https://datahub.io/core/s-and-p-500-companies/r/0.csv")["Symbol"]),
-    "NASDAQ-100": list(pd.read_csv("https://datahub.io/core/nasdaq-listings/r/0.csv")["Symbol"]),
     "Dow Jones": [
         "AAPL", "AMGN", "AXP", "BA", "CAT", "CRM", "CSCO", "CVX", "DIS", "DOW", "GS", "HD", "HON", "IBM", "INTC",
         "JNJ", "JPM", "KO", "MCD", "MMM", "MRK", "MSFT", "NKE", "PG", "TRV", "UNH", "V", "VZ", "WBA", "WMT"
@@ -47,24 +60,165 @@ tickers = {
         "RNO.PA", "SAF.PA", "SAN.PA", "SGO.PA", "STLA.PA", "STM.PA", "SU.PA", "SW.PA", "TEC.PA", "TTE.PA", "URW.AS", "VIV.PA"
     ]
 }
-ticker = st.sidebar.selectbox(f'Select an Asset from {index} or "Index Average":', ["Index Average"] + tickers[index])
+
+# Local cache of downloaded prices (one Parquet file per ticker) and constituent lists
+cache_dir = Path(__file__).with_name("cache")
+
+# Write a cache file through a temporary file, so concurrent sessions never read a half-written one
+def write_cache(path, write):
+    tmp_path = None
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # The cache is only an optimization, a read-only directory must not break the app
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
+
+# Load index constituents (remote lists fetched concurrently, cached daily)
+def _fetch(index, url):
+    # Fall back to the last downloaded copy, or else to the list shipped with the app, when the list cannot be fetched
+    local_path = cache_dir / f"{index}.csv"
+    try:
+        symbols = pd.read_csv(url, usecols=["Symbol"])
+    except (OSError, ValueError):
+        symbols = pd.read_csv(local_path if local_path.exists() else tickers_files[index], usecols=["Symbol"])
+    else:
+        write_cache(local_path, lambda tmp_path: symbols.to_csv(tmp_path, index=False))
+    return index, list(symbols["Symbol"])
+
+@st.cache_data(ttl=86400, show_spinner="Constituents Loading...")
+def load_index_constituents():
+    constituents = {}
+    with ThreadPoolExecutor(max_workers=len(tickers_urls)) as executor:
+        futures = [executor.submit(_fetch, index, url) for index, url in tickers_urls.items()]
+        for future in as_completed(futures):
+            # A list that cannot be loaded is left out, the other indices stay usable
+            try:
+                index_name, symbols = future.result()
+            except (OSError, ValueError):
+                continue
+            constituents[index_name] = symbols
+    return constituents
+
+# Static lists need no network, remote ones come from the cached loader
+if index in tickers:
+    constituents = tickers[index]
+else:
+    constituents = load_index_constituents().get(index)
+    if constituents is None:
+        st.sidebar.error(f"❌ The {index} constituents could not be loaded, only the index average is available.")
+        # Do not keep the incomplete result for the rest of the day, retry on the next rerun
+        load_index_constituents.clear()
+        constituents = []
+ticker = st.sidebar.selectbox(f'Select an Asset from {index} or "Index Average":', ["Index Average"] + constituents)
 if ticker == "Index Average":
     ticker = tickers_index_average[index]
 start_date = st.sidebar.date_input("Select a Start Date:", pd.to_datetime("2020-01-01"))
 end_date = st.sidebar.date_input("Select an End Date:", pd.to_datetime("today"))
 
-# Load asset data
+def download_data(ticker, start_date, end_date):
+    return yf.download(ticker, start=start_date, end=end_date, auto_adjust=True, multi_level_index=False)
+
+# Read a cached price file and the [start, end) range it covers, an unreadable file is a cache miss
+def read_cache(path):
+    try:
+        cached = pd.read_parquet(path, engine="pyarrow")
+        covered_start, covered_end = (pd.Timestamp(date) for date in cached.attrs["covered"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None, None
+    if cached.empty:
+        return None, None, None
+    return cached, covered_start, covered_end
+
+# Load asset data (only the days missing from the Parquet cache are downloaded)
 @st.cache_data(show_spinner="Data Loading...")
 def load_data(ticker, start_date, end_date):
-    data = yf.download(ticker, start=start_date, end=end_date, auto_adjust=True)
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    cache_path = cache_dir / f"{ticker}.parquet"
+    cached, covered_start, covered_end = read_cache(cache_path)
+    written = (covered_start, covered_end)
+    downloads = []
+    if cached is not None:
+        # Each gap is downloaded together with the cached bar next to it. An empty reply therefore means the
+        # download failed, and the gap stays uncovered so it is fetched again. Prices are adjusted, so a changed
+        # Close on that bar means a split or dividend has rescaled the history since the file was written
+        gaps = []
+        if start_date < covered_start:
+            gaps.append(("start", start_date, cached.index[0] + pd.Timedelta(days=1), cached.index[0]))
+        if end_date > covered_end:
+            gaps.append(("end", cached.index[-1], end_date, cached.index[-1]))
+        for edge, gap_start, gap_end, bar_date in gaps:
+            gap = download_data(ticker, gap_start, gap_end)
+            if gap.empty:
+                continue
+            if not np.isclose(gap["Close"].get(bar_date, np.nan), cached.at[bar_date, "Close"]):
+                # The cached history is stale, download the whole range again
+                cached, downloads = None, []
+                break
+            downloads.append(gap)
+            if edge == "start":
+                covered_start = start_date
+            else:
+                covered_end = end_date
+    if cached is None:
+        # Download the requested range, together with everything a stale file covered
+        covered_start = start_date if written[0] is None else min(start_date, written[0])
+        covered_end = end_date if written[1] is None else max(end_date, written[1])
+        downloads = [download_data(ticker, covered_start, covered_end)]
+    # Today's bar is still moving, keep it out of the cache
+    today = pd.Timestamp.today().normalize()
+    covered = (covered_start, min(covered_end, today))
+    cached = [] if cached is None else [cached]
+    frames = [frame for frame in cached + downloads if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    # Only the closing price is used, drop Open/High/Low/Volume before anything is cached. Rows without
+    # a Close are dropped too, the indicator kernels would carry a single NaN through the rest of the series
+    prices = pd.concat(frames)[["Close"]].dropna().sort_index()
+    prices = prices[~prices.index.duplicated(keep="last")]
+    cache = prices[prices.index < today].copy()
+    if covered != written and not cache.empty:
+        cache.attrs = {"covered": [date.isoformat() for date in covered]}
+        write_cache(cache_path, lambda tmp_path: cache.to_parquet(tmp_path, engine="pyarrow"))
+
+    data = prices[(prices.index >= start_date) & (prices.index < end_date)].copy()
     data["Return"] = data["Close"].pct_change()
+    data[["Close", "Return"]] = data[["Close", "Return"]].astype(np.float32)
     return data
 
+# Strategy indicators and buy/sell signals
+def compute_ma(close, short_window, long_window):
+    short_ma = sma(close, short_window)
+    long_ma = sma(close, long_window)
+    signal = np.select([short_ma > long_ma, short_ma <= long_ma], [1, -1], default=0).astype(np.int8)
+    return short_ma, long_ma, signal
+
+def compute_rsi(close, rsi_period):
+    rsi = rsi_wilder(close, rsi_period)
+    signal = np.select([rsi < 30, rsi > 70], [1, -1], default=0).astype(np.int8) # Buy when RSI < 30, Sell when RSI > 70
+    return rsi, signal
+
+def compute_macd(close, short_ema, long_ema, signal_period):
+    # Close is float32, cast it once so ema is only compiled for float64 (the type of macd)
+    close = close.astype(np.float64)
+    macd = ema(close, 2 / (short_ema + 1)) - ema(close, 2 / (long_ema + 1))
+    signal_line = ema(macd, 2 / (signal_period + 1))
+    signal = np.select([macd > signal_line, macd < signal_line], [1, -1], default=0).astype(np.int8) # Buy / Sell
+    return macd, signal_line, signal
+
 data = load_data(ticker, start_date, end_date)
 
 if data.empty:
     st.error("❌ No data available for the specified asset. Please check the ticker or dates.")
 else:
+    # Indicators are kept as local arrays, data only holds the downloaded prices and returns
+    close = data["Close"].to_numpy()
+    returns = data["Return"].to_numpy()
+
     # Strategy: Moving Averages
     if strategy == "Moving Averages":
         # Strategy Parameters
@@ -72,29 +226,21 @@ else:
         short_window = st.sidebar.slider("Select a Short Moving Average Period (days):", 5, 50, 20)
         long_window = st.sidebar.slider("Select a Long Moving Average Period (days):", 50, 200, 100)
 
-        # Calculate moving averages
-        data["Short_MA"] = data["Close"].rolling(window=short_window).mean()
-        data["Long_MA"] = data["Close"].rolling(window=long_window).mean()
+        # Calculate moving averages and buy/sell signals
+        short_ma, long_ma, signal = compute_ma(close, short_window, long_window)
+        warmup = long_window - 1
 
-        # Generate buy/sell signals
-        data["Signal"] = 0
-        data.loc[data["Short_MA"] > data["Long_MA"], "Signal"] = 1
-        data.loc[data["Short_MA"] <= data["Long_MA"], "Signal"] = -1
-
-        # Strategy returns
-        data["Strategy_Return"] = data["Signal"].shift(1) * data["Return"]
-
-        # Plot moving averages
-        st.subheader(f"📊 Asset Price ({ticker}) and Moving Averages")
-        fig, ax = plt.subplots(figsize=(14, 7))
-        ax.plot(data.index, data["Close"], label="Closing Price", color="blue")
-        ax.plot(data.index, data["Short_MA"], label=f"Short MA ({short_window} days)", color="green")
-        ax.plot(data.index, data["Long_MA"], label=f"Long MA ({long_window} days)", color="red")
-        ax.legend(loc="upper left")
-        ax.set_title(f"Price and Moving Averages for {ticker}")
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Price")
-        st.pyplot(fig)
+        # Plot moving averages (once they are defined)
+        if close.size > warmup:
+            st.subheader(f"📊 Asset Price ({ticker}) and Moving Averages")
+            st.line_chart(
+                pd.DataFrame({
+                    "Closing Price": close[warmup:],
+                    f"Short MA ({short_window} days)": short_ma[warmup:],
+                    f"Long MA ({long_window} days)": long_ma[warmup:]
+                }, index=data.index[warmup:]),
+                x_label="Date", y_label="Price", color=["#0000FF", "#008000", "#FF0000"], height=500
+            )
 
     # Strategy: RSI
     elif strategy == "RSI (Relative Strength Index)":
@@ -102,39 +248,30 @@ else:
         st.sidebar.header("⚙️ RSI Parameter")
         rsi_period = st.sidebar.slider("Select a RSI Period (days):", 5, 50, 14)
 
-        delta = data["Close"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
-        rs = gain / loss
-        data["RSI"] = 100 - (100 / (1 + rs))
-
-        # Generate buy/sell signals
-        data["Signal"] = 0
-        data.loc[data["RSI"] < 30, "Signal"] = 1 # Buy when RSI < 30
-        data.loc[data["RSI"] > 70, "Signal"] = -1 # Sell when RSI > 70
+        rsi, signal = compute_rsi(close, rsi_period)
+        warmup = rsi_period
 
-        # Strategy returns
-        data["Strategy_Return"] = data["Signal"].shift(1) * data["Return"]
+        # Plot RSI (once it is defined)
+        if close.size > warmup:
+            st.subheader(f"📊 RSI Strategy for {ticker}")
+            fig = Figure(figsize=(14, 10))
+            ax1, ax2 = fig.subplots(2, 1, sharex=True)
 
-        # Plot RSI
-        st.subheader(f"📊 RSI Strategy for {ticker}")
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), sharex=True)
+            # Price plot
+            ax1.plot(data.index[warmup:], close[warmup:], label="Closing Price", color="blue")
+            ax1.set_title(f"Price of {ticker}")
+            ax1.set_ylabel("Price")
+            ax1.legend(loc="upper left")
 
-        # Price plot
-        ax1.plot(data.index, data["Close"], label="Closing Price", color="blue")
-        ax1.set_title(f"Price of {ticker}")
-        ax1.set_ylabel("Price")
-        ax1.legend(loc="upper left")
-
-        # RSI plot
-        ax2.plot(data.index, data["RSI"], label="RSI", color="purple")
-        ax2.axhline(70, color="red", linestyle="--", label="Overbought (70)")
-        ax2.axhline(30, color="green", linestyle="--", label="Oversold (30)")
-        ax2.set_title(f"RSI for {ticker}")
-        ax2.set_xlabel("Date")
-        ax2.set_ylabel("RSI")
-        ax2.legend(loc="upper left")
-        st.pyplot(fig)
+            # RSI plot
+            ax2.plot(data.index[warmup:], rsi[warmup:], label="RSI", color="purple")
+            ax2.axhline(70, color="red", linestyle="--", label="Overbought (70)")
+            ax2.axhline(30, color="green", linestyle="--", label="Oversold (30)")
+            ax2.set_title(f"RSI for {ticker}")
+            ax2.set_xlabel("Date")
+            ax2.set_ylabel("RSI")
+            ax2.legend(loc="upper left")
+            st.pyplot(fig)
 
     # Strategy: MACD Strategy
     elif strategy == "MACD (Moving Average Convergence Divergence)":
@@ -144,60 +281,64 @@ else:
         long_ema = st.sidebar.slider("Select a Long EMA Period (days):", 20, 200, 26)
         signal_period = st.sidebar.slider("Select a Signal Line EMA Period (days):", 5, 20, 9)
         
-        # Calculate MACD
-        data["Short_EMA"] = data["Close"].ewm(span=short_ema, adjust=False).mean()
-        data["Long_EMA"] = data["Close"].ewm(span=long_ema, adjust=False).mean()
-        data["MACD"] = data["Short_EMA"] - data["Long_EMA"]
-        data["Signal_Line"] = data["MACD"].ewm(span=signal_period, adjust=False).mean()
-
-        # Generate buy/sell signals based on MACD crossovers
-        data["Signal"] = 0
-        data.loc[data["MACD"] > data["Signal_Line"], "Signal"] = 1 # Buy
-        data.loc[data["MACD"] < data["Signal_Line"], "Signal"] = -1 # Sell
-
-        # Strategy returns
-        data["Strategy_Return"] = data["Signal"].shift(1) * data["Return"]
+        # Calculate MACD and buy/sell signals based on MACD crossovers
+        macd, signal_line, signal = compute_macd(close, short_ema, long_ema, signal_period)
+        warmup = 0 # The EMAs are defined from the first day
 
         # Plot MACD with signals
         st.subheader(f"📊 MACD Strategy for {ticker}")
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), gridspec_kw={"height_ratios": [3, 1]})
+        fig = Figure(figsize=(14, 10))
+        ax1, ax2 = fig.subplots(2, 1, gridspec_kw={"height_ratios": [3, 1]})
         
         # Price chart
-        ax1.plot(data.index, data["Close"], label="Closing Price", color="blue")
+        ax1.plot(data.index, close, label="Closing Price", color="blue")
         ax1.set_title(f"{ticker} Price and MACD")
         ax1.set_ylabel("Price")
         ax1.legend(loc="upper left")
 
         # MACD chart
-        ax2.plot(data.index, data["MACD"], label="MACD", color="purple")
-        ax2.plot(data.index, data["Signal_Line"], label="Signal Line", color="orange", linestyle="--")
+        ax2.plot(data.index, macd, label="MACD", color="purple")
+        ax2.plot(data.index, signal_line, label="Signal Line", color="orange", linestyle="--")
         ax2.axhline(y=0, color="black", linestyle="--", linewidth=0.8)
         ax2.set_ylabel("MACD")
         ax2.set_xlabel("Date")
         ax2.legend(loc="upper left")
         st.pyplot(fig)
 
-    # Calculate cumulative returns
-    data["Cumulative_Market_Return"] = (1 + data["Return"]).cumprod()
-    data["Cumulative_Strategy_Return"] = (1 + data["Strategy_Return"]).cumprod()
-
-    # Plot cumulative performance
-    st.subheader(f"📊 Cumulative Performance: {strategy.split(" (", 1)[0]} vs Market")
-    fig, ax = plt.subplots(figsize=(14, 7))
-    ax.plot(data.index, data["Cumulative_Market_Return"], label="Market (Buy & Hold)", color="blue")
-    ax.plot(data.index, data["Cumulative_Strategy_Return"], label=f"{strategy} Strategy", color="orange")
-    ax.legend(loc="upper left")
-    ax.set_title(f"Cumulative Performance for {ticker}")
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Cumulative Returns")
-    st.pyplot(fig)
-
-    # Performance Summary
-    st.sidebar.subheader("📈 Performance Summary")
-    total_return = data["Return"].sum()
-    strategy_return = data["Strategy_Return"].sum()
-    st.sidebar.metric("Total Market Return (%):", f"{total_return * 100:.2f}")
-    st.sidebar.metric("Total Strategy Return (%):", f"{strategy_return * 100:.2f}")
+    if close.size <= warmup:
+        st.warning(
+            f"⚠️ The {strategy.split(' (', 1)[0]} strategy needs more than {warmup} trading days to produce a signal, "
+            f"the selected range has {close.size}. Please select an earlier start date to see its performance."
+        )
+    else:
+        # Start the comparison on the first day with a defined signal, so the NaN warmup does not enter the returns
+        dates = data.index[warmup:]
+        returns = returns[warmup:].copy()
+        returns[0] = np.nan
+
+        # Strategy returns
+        strategy_returns = apply_signal(signal[warmup:], returns)
+
+        # Calculate cumulative returns (compounded in log space)
+        cumulative_market_returns = np.exp(np.nancumsum(np.log1p(returns), dtype=np.float64))
+        cumulative_strategy_returns = np.exp(np.nancumsum(np.log1p(strategy_returns), dtype=np.float64))
+
+        # Plot cumulative performance
+        st.subheader(f"📊 Cumulative Performance: {strategy.split(" (", 1)[0]} vs Market")
+        st.line_chart(
+            pd.DataFrame({
+                "Market (Buy & Hold)": cumulative_market_returns,
+                f"{strategy} Strategy": cumulative_strategy_returns
+            }, index=dates),
+            x_label="Date", y_label="Cumulative Returns", color=["#0000FF", "#FFA500"], height=500
+        )
+
+        # Performance Summary
+        st.sidebar.subheader("📈 Performance Summary")
+        total_return = float(cumulative_market_returns[-1]) - 1.0
+        strategy_return = float(cumulative_strategy_returns[-1]) - 1.0
+        st.sidebar.metric("Total Market Return (%):", f"{total_return * 100:.2f}")
+        st.sidebar.metric("Total Strategy Return (%):", f"{strategy_return * 100:.2f}")
 
 # Author
 st.markdown("""Made by [Alexandre Deroux](https://www.linkedin.com/in/alexandre-deroux).""", unsafe_allow_html=True)
\ No newline at end of file